@@ -1,9 +1,17 @@
 import streamlit as st
 import pandas as pd
-import seaborn as sns
+import plotly.express as px
+import matplotlib
+matplotlib.use("Agg")  # Non-interactive backend: Streamlit only needs rendered images
 import matplotlib.pyplot as plt
 import os
+import glob
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pv
+from numba import njit
 
 st.set_page_config(layout="wide")
 st.title("🧵 AI-Driven Fashion Trend Forecasting for SMEs")
@@ -35,50 +43,127 @@ product_to_category = {
     "Jumpsuit": "Jumpsuits"
 }
 
+# Categorical lookup table so Category can be mapped onto all rows in one shot
+product_categories = pd.Series(
+    product_to_category,
+    dtype=pd.CategoricalDtype(sorted({*product_to_category.values(), "Unknown"})),
+)
+
 city_aliases = {
     "UK": ["London", "Birmingham"],
     "Spain": ["Madrid", "Barcelona"]
 }
 
-@st.cache_data
-def load_all_data():
-    all_data = []
+# Google Trends exports start with a "Category" line and a blank line before the header
+csv_read_options = pv.ReadOptions(skip_rows=3, column_names=["Date", "Mentions"])
+csv_convert_options = pv.ConvertOptions(column_types={"Date": pa.timestamp("ns"), "Mentions": pa.int32()})
 
-    for folder in os.listdir(data_root):
-        folder_path = os.path.join(data_root, folder)
-        if not os.path.isdir(folder_path):
-            continue
+# Bump when load_all_data's post-processing (columns, dtypes) changes, so old Parquet caches are not reused
+cache_version = 1
 
-        for file in os.listdir(folder_path):
-            if not file.endswith(".csv"):
-                continue
+def with_constant(table, name, value):
+    return table.append_column(name, pa.repeat(pa.scalar(value, pa.string()), table.num_rows))
 
-            file_path = os.path.join(folder_path, file)
-            try:
-                df = pd.read_csv(file_path, skiprows=2)
-                df.columns = ["Date", "Mentions"]
-                df["Date"] = pd.to_datetime(df["Date"])
+def parse_csv(file, file_path):
+    table = pv.read_csv(file_path, read_options=csv_read_options, convert_options=csv_convert_options)
 
-                name_parts = file.replace(".csv", "").split("_")
-                product = name_parts[0]
-                location_tag = name_parts[1]
+    name_parts = file.replace(".csv", "").split("_")
+    product = name_parts[0]
+    location_tag = name_parts[1]
 
-                df["Product"] = product
-                df["Category"] = product_to_category.get(product, "Unknown")
+    table = with_constant(table, "Product", product)
 
-                if location_tag in city_aliases:
-                    for city in city_aliases[location_tag]:
-                        temp_df = df.copy()
-                        temp_df["Location"] = city
-                        all_data.append(temp_df)
-                else:
-                    df["Location"] = location_tag
-                    all_data.append(df)
+    # Parse once; aliased regions are expanded to their cities in load_all_data
+    return table, city_aliases.get(location_tag, [location_tag])
 
-            except Exception as e:
-                st.warning(f"⚠️ Error reading {file_path}: {e}")
+@st.cache_data
+def load_all_data():
+    csv_files = []
+    for folder in os.listdir(data_root):
+        folder_path = os.path.join(data_root, folder)
+        if not os.path.isdir(folder_path):
+            continue
 
-    return pd.concat(all_data, ignore_index=True) if all_data else pd.DataFrame()
+        for file in os.listdir(folder_path):
+            if file.endswith(".csv"):
+                csv_files.append((file, os.path.join(folder_path, file)))
+
+    # Consolidated Parquet copy on disk, keyed on the CSV paths and mtimes plus the
+    # mappings and parse options that shape the frame, so it survives restarts and
+    # is rebuilt whenever an export or the loading code changes
+    fingerprint = (
+        sorted((path, os.path.getmtime(path)) for _, path in csv_files),
+        sorted(product_to_category.items()),
+        sorted(city_aliases.items()),
+        csv_read_options.skip_rows,
+        csv_read_options.column_names,
+        sorted((name, str(dtype)) for name, dtype in csv_convert_options.column_types.items()),
+        cache_version,
+    )
+    digest = hashlib.sha1(repr(fingerprint).encode()).hexdigest()[:16]
+    cache_path = os.path.join(data_root, f"_cache_{digest}.parquet")
+    if os.path.exists(cache_path):
+        return pd.read_parquet(cache_path, engine="pyarrow")
+
+    parsed = []
+    read_errors = False
+
+    # pyarrow releases the GIL while reading, so files are parsed concurrently;
+    # warnings are raised here on the script thread, in file order
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        jobs = [(file_path, executor.submit(parse_csv, file, file_path)) for file, file_path in csv_files]
+
+    for file_path, job in jobs:
+        try:
+            parsed.append(job.result())
+        except Exception as e:
+            st.warning(f"⚠️ Error reading {file_path}: {e}")
+            read_errors = True
+
+    if not parsed:
+        return pd.DataFrame()
+
+    # Dictionary-encode Location so each city name is stored once and alias
+    # rows share the parsed Date/Mentions buffers instead of copying them
+    location_names = sorted({city for _, cities in parsed for city in cities})
+    location_dictionary = pa.array(location_names, pa.string())
+    location_index = {city: i for i, city in enumerate(location_names)}
+
+    all_tables = []
+    for table, cities in parsed:
+        for city in cities:
+            codes = pa.repeat(pa.scalar(location_index[city], pa.int32()), table.num_rows)
+            location = pa.DictionaryArray.from_arrays(codes, location_dictionary)
+            all_tables.append(table.append_column("Location", location))
+
+    out = pa.concat_tables(all_tables).to_pandas()
+    # Filter and groupby keys: categorical codes make isin/groupby integer operations
+    out["Product"] = out["Product"].astype("category")
+    category = out["Product"].map(product_categories).fillna("Unknown")
+    out["Category"] = category.cat.remove_unused_categories()
+
+    # Only persist complete loads, so a file that failed to parse is retried next time
+    if not read_errors:
+        try:
+            for stale_path in glob.glob(os.path.join(data_root, "_cache_*.parquet")):
+                os.remove(stale_path)
+            out.to_parquet(cache_path, engine="pyarrow", compression="zstd", index=False)
+        except OSError:
+            pass  # Read-only data folder: fall back to the in-process cache only
+    return out
+
+# Fused growth kernel: compare, select and clip in one pass over the Start/End arrays
+@njit(cache=True)
+def capped_growth(start, end, out):
+    for i in range(start.size):
+        s = start[i]
+        e = end[i]
+        if s < 20:
+            out[i] = 0.0  # Ignore very low base counts to avoid huge misleading %
+        else:
+            change = ((e - s) / s) * 100
+            # Cap between -1000% and +1000%
+            out[i] = 1000.0 if change > 1000 else (-1000.0 if change < -1000 else change)
 
 # Load Data
 with st.spinner("📥 Loading Google Trends data..."):
@@ -88,11 +173,15 @@ if df.empty:
     st.warning("⚠️ No data available.")
     st.stop()
 
+# Dates as int64 nanoseconds for the range filter, taken from the loaded frame itself
+# (a zero-copy view, since load_all_data produces datetime64[ns])
+dates_i8 = df["Date"].to_numpy().astype("datetime64[ns]", copy=False).view("i8")
+
 # Sidebar Filters
 st.sidebar.header("🔍 Filters")
-unique_products = sorted(df["Product"].unique())
-unique_categories = sorted(df["Category"].unique())
-unique_locations = sorted(df["Location"].unique())
+unique_products = df["Product"].cat.categories.tolist()
+unique_categories = df["Category"].cat.categories.tolist()
+unique_locations = df["Location"].cat.categories.tolist()
 
 selected_products = st.sidebar.multiselect("Select Products", unique_products, default=unique_products[:5])
 selected_categories = st.sidebar.multiselect("Select Categories", unique_categories, default=unique_categories)
@@ -105,13 +194,31 @@ date_range = st.sidebar.slider(
     value=(df["Date"].min().date(), df["Date"].max().date())
 )
 
-# Filter dataframe based on selections
-df_filtered = df[
-    df["Product"].isin(selected_products) &
-    df["Category"].isin(selected_categories) &
-    df["Location"].isin(selected_locations) &
-    df["Date"].between(pd.to_datetime(date_range[0]), pd.to_datetime(date_range[1]))
-]
+# Boolean mask of rows whose categorical code is one of the selected values
+def category_mask(column, values):
+    return np.isin(column.cat.codes.to_numpy(), column.cat.categories.get_indexer(values))
+
+# Filter dataframe based on selections; cached so reruns with unchanged filters skip the mask
+# (the leading underscore tells Streamlit not to hash the full frame)
+@st.cache_data
+def filter_data(_df, _dates_i8, products, categories, locations, start_date, end_date):
+    # One mask array, combined in place instead of allocating an intermediate per condition
+    mask = category_mask(_df["Product"], products)
+    np.logical_and(mask, category_mask(_df["Category"], categories), out=mask)
+    np.logical_and(mask, category_mask(_df["Location"], locations), out=mask)
+    np.logical_and(mask, _dates_i8 >= np.datetime64(start_date, "ns").view("i8"), out=mask)
+    np.logical_and(mask, _dates_i8 <= np.datetime64(end_date, "ns").view("i8"), out=mask)
+    return _df[mask]
+
+# Sorted tuples keep the cache key hashable and independent of selection order
+filter_key = (
+    tuple(sorted(selected_products)),
+    tuple(sorted(selected_categories)),
+    tuple(sorted(selected_locations)),
+    date_range[0],
+    date_range[1],
+)
+df_filtered = filter_data(df, dates_i8, *filter_key)
 
 if df_filtered.empty:
     st.warning("⚠️ No data matches the selected filters.")
@@ -123,38 +230,36 @@ if df_filtered.empty:
 first_date = df_filtered["Date"].min()
 last_date = df_filtered["Date"].max()
 
-agg_start = df_filtered[df_filtered["Date"] == first_date].groupby("Product")["Mentions"].sum()
-agg_end = df_filtered[df_filtered["Date"] == last_date].groupby("Product")["Mentions"].sum()
-
-growth_df = pd.DataFrame({"Start": agg_start, "End": agg_end}).fillna(0)
+# One groupby over both boundary dates; reindex keeps two columns when they coincide
+edge_mask = df_filtered["Date"].isin([first_date, last_date])
+growth_df = (
+    df_filtered.loc[edge_mask]
+    .groupby(["Product", "Date"], observed=True)["Mentions"]
+    .sum()
+    .unstack("Date", fill_value=0)
+    .reindex(columns=[first_date, last_date], fill_value=0)
+)
+growth_df.columns = ["Start", "End"]
 
 # Avoid divide by zero and extreme % changes
-def capped_growth(row):
-    start = row["Start"]
-    end = row["End"]
-    if start < 20:
-        return 0  # Ignore very low base counts to avoid huge misleading %
-    if start == 0:
-        return 100.0 if end > 0 else 0
-    change = ((end - start) / start) * 100
-    # Cap between -1000% and +1000%
-    if change > 1000:
-        change = 1000
-    elif change < -1000:
-        change = -1000
-    return change
-
-growth_df["Growth %"] = growth_df.apply(capped_growth, axis=1)
+start = growth_df["Start"].to_numpy(dtype=float)
+end = growth_df["End"].to_numpy(dtype=float)
+growth = np.empty_like(start)
+capped_growth(start, end, growth)
+growth_df["Growth %"] = growth
 
 # Top growing and declining products (exclude 0 growth)
-growth_nonzero = growth_df[growth_df["Growth %"] != 0]
+nonzero = growth != 0
 
-if not growth_nonzero.empty:
-    top_growing_product = growth_nonzero["Growth %"].idxmax()
-    top_growing_value = growth_nonzero.loc[top_growing_product, "Growth %"]
+if nonzero.any():
+    growth_nonzero = growth[nonzero]
+    products_nonzero = growth_df.index[nonzero]
 
-    top_declining_product = growth_nonzero["Growth %"].idxmin()
-    top_declining_value = growth_nonzero.loc[top_declining_product, "Growth %"]
+    top_growing_product = products_nonzero[np.argmax(growth_nonzero)]
+    top_growing_value = growth_nonzero.max()
+
+    top_declining_product = products_nonzero[np.argmin(growth_nonzero)]
+    top_declining_value = growth_nonzero.min()
 else:
     top_growing_product = None
     top_growing_value = None
@@ -202,75 +307,106 @@ with col3:
         st.markdown("**Top Declining Product**")
         st.write("N/A")
 
+# Chart pivots, cached per filter selection (the filtered frame itself is not hashed)
+@st.cache_data
+def compute_pivots(filter_key, _df):
+    # Location x Product totals, shared by the top location KPI, heatmap and category share
+    pop_dist = _df.groupby(["Location", "Product"], observed=True)["Mentions"].sum().unstack(fill_value=0)
+
+    # Same product_categories lookup load_all_data uses, aligned to the pivot's product columns
+    column_categories = product_categories.reindex(pop_dist.columns.astype(str), fill_value="Unknown")
+    cat_city = pop_dist.T.groupby(column_categories.to_numpy()).sum().T.rename_axis(columns="Category")
+    cat_city_pct = cat_city.div(cat_city.sum(axis=1), axis=0) * 100
+
+    # Daily Date x Product pivot, then bucket the datetime index into weeks
+    weekly_kw = (
+        _df.pivot_table(
+            index="Date", columns="Product", values="Mentions", aggfunc="sum", observed=True, fill_value=0
+        )
+        .resample("W")
+        .sum()
+    )
+
+    return {"pop_dist": pop_dist, "cat_city": cat_city, "cat_city_pct": cat_city_pct, "weekly_kw": weekly_kw}
+
+pivots = compute_pivots(filter_key, df_filtered)
+pop_dist = pivots["pop_dist"]
+
 # Top Location by total mentions
-top_location = df_filtered.groupby("Location")["Mentions"].sum().idxmax()
+top_location = pop_dist.sum(axis=1).idxmax()
 col4.metric("Top Location", top_location)
 
 # --- Product popularity distribution across cities ---
 st.subheader("🏙️ Product Popularity Distribution Across Cities")
 
-pop_dist = df_filtered.groupby(["Location", "Product"])["Mentions"].sum().unstack(fill_value=0)
-
-plt.figure(figsize=(14, 6))
-sns.heatmap(pop_dist, annot=True, fmt="d", cmap="Blues")
-plt.title("Total Mentions of Products by City")
-plt.xlabel("Product")
-plt.ylabel("City")
-plt.xticks(rotation=45)
-st.pyplot(plt)
+# Display-only copy in the narrowest integer type that holds the largest total;
+# cells are totals over many days, so they routinely exceed int8's range
+pop_disp = pop_dist.to_numpy()
+pop_disp = pop_disp.astype(np.min_scalar_type(pop_disp.max()))
+
+# Rendered in the browser, so the cell annotations are not drawn in Python on every rerun
+fig = px.imshow(
+    pop_disp,
+    x=pop_dist.columns.astype(str),
+    y=pop_dist.index.astype(str),
+    labels={"x": "Product", "y": "City", "color": "Mentions"},
+    text_auto=True,
+    aspect="auto",
+    color_continuous_scale="Blues",
+    title="Total Mentions of Products by City",
+)
+fig.update_xaxes(tickangle=45)
+st.plotly_chart(fig)
 
 # --- Category share by city ---
 st.subheader("📦 Category Share by City")
 
-cat_city = df_filtered.groupby(["Location", "Category"])["Mentions"].sum().unstack(fill_value=0)
-cat_city_pct = cat_city.div(cat_city.sum(axis=1), axis=0) * 100
-
-st.dataframe(cat_city_pct.style.format("{:.1f}%"))
+st.dataframe(pivots["cat_city_pct"].style.format("{:.1f}%"))
 
 # --- Top 3 Products in Each City ---
 
 st.subheader("🏆 Top 3 Products in Each City")
 
+# Sort once and take each city's top 3 products with a groupby head
 top3_per_city = (
-    df_filtered.groupby(["Location", "Product"])["Mentions"]
+    df_filtered.groupby(["Location", "Product"], observed=True)["Mentions"]
     .sum()
     .reset_index()
+    .sort_values(["Location", "Mentions"], ascending=[True, False])
+    .groupby("Location", observed=True)
+    .head(3)
 )
 
-# For each city get top 3 products
-def format_top3(city_df):
-    city = city_df.name
-    df_sorted = city_df.sort_values("Mentions", ascending=False).head(3)
-    result = f"**{city}**\n"
-    for i, row in enumerate(df_sorted.itertuples(), 1):
-        result += f"{i}. {row.Product} — {int(row.Mentions)} mentions\n"
-    return result
-
-top3_text = top3_per_city.groupby("Location").apply(format_top3)
+# Arrow-backed strings concatenate on contiguous buffers rather than Python str objects
+rank = top3_per_city.groupby("Location", observed=True).cumcount().add(1).astype("string[pyarrow]")
+top3_per_city["line"] = (
+    rank + ". " + top3_per_city["Product"].astype("string[pyarrow]")
+    + " — " + top3_per_city["Mentions"].astype("string[pyarrow]") + " mentions"
+)
+top3_text = top3_per_city.groupby("Location", observed=True)["line"].apply("\n".join)
 
-for city, text in top3_text.items():
-    st.markdown(text)
+for city, lines in top3_text.items():
+    st.markdown(f"**{city}**\n{lines}\n")
 
 
 # --- Weekly Trend Line by Product ---
 
 st.subheader("📈 Weekly Trend Line by Product")
 
-weekly_kw = (
-    df_filtered.groupby([pd.Grouper(key="Date", freq="W"), "Product"])["Mentions"]
-    .sum()
-    .reset_index()
-    .pivot(index="Date", columns="Product", values="Mentions")
-    .fillna(0)
-)
-
-plt.figure(figsize=(12, 5))
-for kw in weekly_kw.columns:
-    plt.plot(weekly_kw.index, weekly_kw[kw], label=kw, marker='o')
-plt.legend()
-plt.title("Weekly Google Search Trends")
-plt.xlabel("Week")
-plt.ylabel("Mentions")
-plt.xticks(rotation=45)
-plt.grid(True)
-st.pyplot(plt)
+# Cached per filter selection; the figure is closed before it is returned so
+# pyplot's figure registry does not grow across reruns
+@st.cache_data
+def weekly_trend_figure(filter_key, _weekly_kw):
+    # One plot call with the 2-D array draws a line per product column
+    fig, ax = plt.subplots(figsize=(12, 5))
+    ax.plot(_weekly_kw.index.values, _weekly_kw.values, marker='o')
+    ax.legend(_weekly_kw.columns.astype(str), loc="best")
+    ax.set_title("Weekly Google Search Trends")
+    ax.set_xlabel("Week")
+    ax.set_ylabel("Mentions")
+    ax.tick_params(axis="x", labelrotation=45)
+    ax.grid(True)
+    plt.close(fig)
+    return fig
+
+st.pyplot(weekly_trend_figure(filter_key, pivots["weekly_kw"]))